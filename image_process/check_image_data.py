@@ -1,9 +1,13 @@
 # test_search.py  ←  save as this name
 
+import hashlib
+import numpy as np
+import torch
 from PIL import Image
-from sentence_transformers import SentenceTransformer
 import weaviate
+from clip_encoder import load_clip_model
 from weaviate.classes.query import MetadataQuery
+from weaviate.util import generate_uuid5
 from pathlib import Path
 import warnings
 warnings.filterwarnings("ignore")  # removes the long "slow processor" warning
@@ -13,9 +17,15 @@ MODEL_NAME = "sentence-transformers/clip-ViT-B-32"
 QUERY_IMAGE = Path("./graphs_only/005_.png")   # ← change if needed
 # -----------------------------------------------------
 
-# Load model (silence the warning)
-print("Loading CLIP model...")
-model = SentenceTransformer(MODEL_NAME)
+# Model is loaded on first use and kept for the life of the process
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        print("Loading CLIP model...")
+        _model = load_clip_model(MODEL_NAME)   # FP16 on GPU, INT8 ONNX Runtime on CPU
+    return _model
 
 # Connect to local Weaviate
 client = weaviate.connect_to_local(
@@ -36,10 +46,20 @@ if not QUERY_IMAGE.exists():
     client.close()
     exit()
 
-# Load and encode the query image
-print(f"Loading query image: {QUERY_IMAGE.name}")
-query_image = Image.open(QUERY_IMAGE).convert("RGB")
-query_vector = model.encode(query_image, normalize_embeddings=True).tolist()
+# If the query image is already indexed, reuse its stored vector.
+# data_store_weav.py derives the UUID from the file's content hash.
+digest = hashlib.blake2b(QUERY_IMAGE.read_bytes(), digest_size=16).hexdigest()
+stored = collection.query.fetch_object_by_id(generate_uuid5(digest), include_vector=True)
+
+if stored is not None and stored.vector:
+    print(f"Using stored vector for: {QUERY_IMAGE.name}")
+    query_vector = np.asarray(stored.vector["default"], dtype=np.float32)
+else:
+    # Load and encode the query image
+    print(f"Loading query image: {QUERY_IMAGE.name}")
+    query_image = Image.open(QUERY_IMAGE).convert("RGB")
+    with torch.inference_mode():
+        query_vector = get_model().encode(query_image, normalize_embeddings=True).astype(np.float32, copy=False)
 
 # Search!
 print("\nSearching for similar graphs...\n")
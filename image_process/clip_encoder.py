@@ -0,0 +1,145 @@
+# filename: clip_encoder.py
+# Shared CLIP image encoder for data_store_weav.py and check_image_data.py
+#
+#   GPU → SentenceTransformer in FP16
+#   CPU → vision tower exported once to ONNX, INT8 dynamic quantization
+#         of MatMul/Gemm, run with onnxruntime (falls back to the FP32
+#         SentenceTransformer if the export or the ONNX session fails)
+#
+# Both scripts must use the same loader so indexed and query vectors match.
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+ONNX_DIR = Path(__file__).parent / "onnx"
+# Conv stays FP32: ORT's CPU ConvInteger kernel has no int8-weight implementation
+INT8_MODEL = "vision_int8_matmul.onnx"
+PARITY_MIN_COSINE = 0.99
+
+
+class OnnxClipImageEncoder:
+    """
+    Drop-in replacement for SentenceTransformer.encode() on images,
+    backed by an INT8-quantized ONNX export of the CLIP vision tower.
+    """
+
+    def __init__(self, model_name, onnx_dir=ONNX_DIR):
+        import onnxruntime as ort
+        from transformers import CLIPImageProcessor
+
+        onnx_dir = Path(onnx_dir)
+        model_path = onnx_dir / INT8_MODEL
+        if not model_path.exists():
+            export_vision_onnx(model_name, onnx_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.processor = CLIPImageProcessor.from_pretrained(onnx_dir)
+
+    def encode(self, images, batch_size=32, normalize_embeddings=False,
+               convert_to_numpy=True, show_progress_bar=False):
+        single = not isinstance(images, (list, tuple))
+        if single:
+            images = [images]
+
+        out = []
+        for i in range(0, len(images), batch_size):
+            pixel_values = self.processor(images=images[i:i + batch_size], return_tensors="np")["pixel_values"]
+            out.append(self.session.run(None, {"pixel_values": pixel_values.astype(np.float32)})[0])
+        vectors = np.concatenate(out) if out else np.empty((0, 512), dtype=np.float32)
+
+        if normalize_embeddings:
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        return vectors[0] if single else vectors
+
+
+def export_vision_onnx(model_name, onnx_dir=ONNX_DIR):
+    """
+    One-time export: CLIP vision tower + projection → ONNX (FP32) → INT8 dynamic quantization.
+    The image preprocessor config is saved next to the model. The quantized model is
+    checked against SentenceTransformer on one image and removed if they disagree.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from PIL import Image
+    from sentence_transformers import SentenceTransformer
+
+    onnx_dir = Path(onnx_dir)
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+
+    print("Exporting CLIP vision tower to ONNX (one-time)...")
+    st_model = SentenceTransformer(model_name, device="cpu")
+    clip = st_model[0].model           # transformers.CLIPModel
+    processor = st_model[0].processor
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, pixel_values):
+            return self.clip.get_image_features(pixel_values=pixel_values)
+
+    size = processor.image_processor.crop_size
+    dummy = torch.zeros(1, 3, size["height"], size["width"])
+    fp32_path = onnx_dir / "vision_fp32.onnx"
+
+    torch.onnx.export(
+        VisionTower(clip).eval(),
+        dummy,
+        str(fp32_path),
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=17
+    )
+    processor.image_processor.save_pretrained(onnx_dir)
+
+    # Parity check on one real chart (random pixels if none are around yet)
+    sample = next(Path("./graphs_only").rglob("*.png"), None)
+    if sample is not None:
+        image = Image.open(sample).convert("RGB")
+    else:
+        image = Image.fromarray(np.random.default_rng(0).integers(0, 256, (224, 224, 3), dtype=np.uint8))
+
+    # Never leave a broken or drifting model in the cache: it would be re-used on every run
+    int8_path = onnx_dir / INT8_MODEL
+    try:
+        quantize_dynamic(
+            str(fp32_path), str(int8_path),
+            op_types_to_quantize=["MatMul", "Gemm"],
+            weight_type=QuantType.QInt8
+        )
+        onnx_vec = OnnxClipImageEncoder(model_name, onnx_dir).encode(image, normalize_embeddings=True)
+        st_vec = st_model.encode(image, normalize_embeddings=True)
+        cosine = float(np.dot(onnx_vec, st_vec))
+        if cosine < PARITY_MIN_COSINE:
+            raise RuntimeError(f"INT8 ONNX vectors drift from SentenceTransformer (cosine {cosine:.4f})")
+    except Exception:
+        int8_path.unlink(missing_ok=True)
+        raise
+
+    print(f"Saved quantized model → {onnx_dir} (cosine vs FP32: {cosine:.4f})")
+
+
+def load_clip_model(model_name):
+    """FP16 SentenceTransformer on CUDA, quantized ONNX Runtime encoder on CPU (FP32 fallback)."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if torch.cuda.is_available():
+        return SentenceTransformer(model_name, device="cuda").half()
+
+    try:
+        return OnnxClipImageEncoder(model_name)
+    except Exception as e:
+        print(f"ONNX Runtime encoder unavailable ({type(e).__name__}: {e}) → FP32 SentenceTransformer")
+        torch.set_num_threads(os.cpu_count())
+        return SentenceTransformer(model_name, device="cpu")
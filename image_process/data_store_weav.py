@@ -1,22 +1,31 @@
 # filename: index_images_to_weaviate.py
 
-import json
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import numpy as np
 from tqdm import tqdm
 from PIL import Image
-from sentence_transformers import SentenceTransformer
 import weaviate
+from clip_encoder import load_clip_model
 from weaviate.util import generate_uuid5
 
 # ====================== CONFIG ======================
 IMAGE_FOLDER = "./graphs_only"                  # your folder with images
-JSON_BACKUP  = "./my_image_vectors_backup.json"
+VECTOR_BACKUP = "./my_image_vectors_backup.npy"      # (N, 512) float16, row i ↔ entry i of META_BACKUP
+META_BACKUP   = "./my_image_vectors_backup_meta.npz" # filenames, paths, hashes as parallel arrays
 CLASS_NAME   = "MyLocalImages"
 MODEL_NAME   = "sentence-transformers/clip-ViT-B-32"   # 512-dim open-source CLIP
+BATCH_SIZE   = 64                               # images per model.encode() call
+DECODE_WORKERS = 8                              # threads decoding images ahead of the encoder
+VECTOR_DIM   = 512
+INSERT_BATCH_SIZE  = 256                        # objects per gRPC insert request
+INSERT_CONCURRENCY = 4                          # insert requests in flight at once
 # ===================================================
 
 print("Loading CLIP model (first run takes ~30 seconds)...")
-model = SentenceTransformer(MODEL_NAME)
+model = load_clip_model(MODEL_NAME)   # FP16 on GPU, INT8 ONNX Runtime on CPU
 
 # Connect to your local Weaviate running on localhost:8080
 client = weaviate.connect_to_local(
@@ -27,6 +36,25 @@ client = weaviate.connect_to_local(
 
 print("Connected to Weaviate → version:", client.get_meta()["version"])
 
+# Find all images
+image_paths = list(Path(IMAGE_FOLDER).rglob("*"))
+image_paths = [p for p in image_paths if p.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}]
+
+
+def configure_hnsw_params(vector_count):
+    """
+    Pick HNSW graph parameters from the corpus size.
+    Larger graphs need more links per node (M) to keep recall up.
+    """
+    if vector_count < 10_000:
+        m = 16
+    elif vector_count < 1_000_000:
+        m = 24
+    else:
+        m = 32
+    return {"max_connections": m, "ef_construction": 128}
+
+
 # Delete class if it already exists (clean start every time)
 if client.collections.exists(CLASS_NAME):
     client.collections.delete(CLASS_NAME)
@@ -37,7 +65,11 @@ collection = client.collections.create(
     name=CLASS_NAME,
     vectorizer_config=weaviate.classes.config.Configure.Vectorizer.none(),  # we bring our own vectors
     vector_index_config=weaviate.classes.config.Configure.VectorIndex.hnsw(
-        distance_metric=weaviate.classes.config.VectorDistances.COSINE
+        distance_metric=weaviate.classes.config.VectorDistances.COSINE,
+        ef=-1,                   # dynamic ef at query time: max(dynamic_ef_min, limit * dynamic_ef_factor)
+        dynamic_ef_min=64,       # low-latency floor for the small top-k queries in check_image_data.py
+        quantizer=weaviate.classes.config.Configure.VectorIndex.Quantizer.sq(),  # int8 vectors in the index, float kept on disk for rescoring
+        **configure_hnsw_params(len(image_paths))
     ),
     properties=[
         weaviate.classes.config.Property(name="filename", data_type=weaviate.classes.config.DataType.TEXT),
@@ -47,49 +79,112 @@ collection = client.collections.create(
 
 print(f"Created collection '{CLASS_NAME}'")
 
-# Find all images
-image_paths = list(Path(IMAGE_FOLDER).rglob("*"))
-image_paths = [p for p in image_paths if p.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}]
+print(f"\nProcessing {len(image_paths)} images...\n")
 
-backup = []
 
-print(f"\nProcessing {len(image_paths)} images...\n")
+def load_image(path):
+    """Read one image file → (content hash, RGB image); (None, None) if it can't be decoded."""
+    try:
+        data = path.read_bytes()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return digest, Image.open(io.BytesIO(data)).convert("RGB")
+    except Exception as e:
+        print(f"Failed {path}: {e}")
+        return None, None
+
+
+slices = [image_paths[i:i + BATCH_SIZE] for i in range(0, len(image_paths), BATCH_SIZE)]
+
+# Vectors are streamed into a memory-mapped .npy as they are encoded (rows for
+# unreadable/duplicate images are trimmed at the end). Metadata is kept column-wise
+# (structure of arrays) so the backup can be scanned with one `vectors @ q`
+vecs = np.lib.format.open_memmap(
+    VECTOR_BACKUP, mode="w+", dtype=np.float16,
+    shape=(max(len(image_paths), 1), VECTOR_DIM)   # a zero-length memmap can't be created
+)
+written = 0
+filenames, paths_col, hashes = [], [], []
+seen = set()       # content hashes already indexed → byte-identical copies are skipped
+duplicates = 0
+
+with collection.batch.fixed_size(batch_size=INSERT_BATCH_SIZE, concurrent_requests=INSERT_CONCURRENCY) as batch, \
+        ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool, \
+        tqdm(total=len(image_paths)) as bar:
+    # PIL releases the GIL while decoding, so slice k+1 is decoded by the pool
+    # while the encoder works on slice k (double-buffering)
+    pending = pool.map(load_image, slices[0]) if slices else None
+    for k in range(len(slices)):
+        decoded = list(pending)
+        pending = pool.map(load_image, slices[k + 1]) if k + 1 < len(slices) else None
+
+        loaded = []
+        for p, (digest, img) in zip(slices[k], decoded):
+            if img is None:
+                continue
+            if digest in seen:
+                duplicates += 1
+                continue
+            seen.add(digest)
+            loaded.append((p, digest, img))
+
+        if loaded:
+            paths   = [p for p, _, _ in loaded]
+            digests = [d for _, d, _ in loaded]
+            imgs    = [img for _, _, img in loaded]
+
+            # One forward pass per slice → (N, 512) array, already L2-normalized
+            vectors = model.encode(
+                imgs,
+                batch_size=BATCH_SIZE,
+                show_progress_bar=False,
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            ).astype(np.float32, copy=False)   # FP16 model → float32 for Weaviate
+
+            # Save to local backup
+            vecs[written:written + len(vectors)] = vectors.astype(np.float16)
+            written += len(vectors)
+
+            for img_path, digest, vec in zip(paths, digests, vectors):
+                filenames.append(img_path.name)
+                paths_col.append(str(img_path))
+                hashes.append(digest)
+
+                # Add to Weaviate
+                batch.add_object(
+                    properties={
+                        "filename": img_path.name,
+                        "path"    : str(img_path)
+                    },
+                    vector=vec,                     # numpy row, no .tolist() round-trip
+                    uuid=generate_uuid5(digest)     # content-based UUID → identical images share one object
+                )
+
+        bar.update(len(slices[k]))
+
+vecs.flush()
+if written < len(vecs):
+    trimmed = np.array(vecs[:written])
+    del vecs
+    np.save(VECTOR_BACKUP, trimmed)
+
+np.savez_compressed(
+    META_BACKUP,
+    filenames=np.array(filenames, dtype=str),
+    paths=np.array(paths_col, dtype=str),
+    hashes=np.array(hashes, dtype=str)
+)
 
-with collection.batch.dynamic() as batch:
-    for img_path in tqdm(image_paths):
-        try:
-            image = Image.open(img_path).convert("RGB")
-
-            # Generate 512-dim vector (already L2-normalized because of normalize_embeddings=True)
-            vector = model.encode(image, show_progress_bar=False, normalize_embeddings=True).tolist()
-
-            # Save to local JSON backup
-            backup.append({
-                "filename": img_path.name,
-                "path"    : str(img_path),
-                "vector"  : vector
-            })
-
-            # Add to Weaviate
-            batch.add_object(
-                properties={
-                    "filename": img_path.name,
-                    "path"    : str(img_path)
-                },
-                vector=vector,
-                uuid=generate_uuid5(img_path)   # deterministic UUID → safe to re-run
-            )
-
-        except Exception as e:
-            print(f"Failed {img_path}: {e}")
-
-# Save the backup file so you can open and see all vectors
-with open(JSON_BACKUP, "w", encoding="utf-8") as f:
-    json.dump(backup, f, indent=2)
+failed = collection.batch.failed_objects
+if failed:
+    print(f"\n{len(failed)} objects failed to insert, e.g.: {failed[0].message}")
 
 print("\nFinished!")
-print(f"Indexed {len(backup)} images into Weaviate (localhost:8080)")
-print(f"Backup JSON with all vectors → {JSON_BACKUP}")
+if duplicates:
+    print(f"Skipped {duplicates} duplicate images (same content as an indexed file)")
+print(f"Indexed {written - len(failed)} images into Weaviate (localhost:8080)")
+print(f"Backup vectors → {VECTOR_BACKUP}  (load with np.load(..., mmap_mode='r'))")
+print(f"Backup metadata → {META_BACKUP}")
 
 client.close()
 
@@ -98,7 +193,7 @@ print("\nQuick search example:")
 print("""
 from PIL import Image
 query_image = Image.open("graphs_only/some_graph.png")
-query_vector = model.encode(query_image, normalize_embeddings=True).tolist()
+query_vector = model.encode(query_image, normalize_embeddings=True)
 
 results = collection.query.near_vector(
     near_vector=query_vector,
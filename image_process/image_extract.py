@@ -1,15 +1,84 @@
 import os
-import json
+import sys
+import orjson
+import functools
+import textwrap
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Dict, Any
 from PIL import Image, ImageDraw, ImageFont
+from tqdm import tqdm
 
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling_core.types.doc import DoclingDocument
 
-def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only", font_size: int = 24) -> List[Dict[str, Any]]:
+@functools.lru_cache(maxsize=1)
+def _get_converter(generate_picture_images: bool = True, images_scale: float = 2.0) -> DocumentConverter:
+    """
+    Build the Docling converter once per pipeline configuration.
+    Model initialization dominates the cost of a conversion, so it is shared across PDFs.
+    """
+    # Configure pipeline options for PDF processing
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.generate_picture_images = generate_picture_images  # Enable image extraction
+    pipeline_options.images_scale = images_scale  # Higher resolution (scale=1 is 72 DPI)
+    # Enable OCR only if needed for scanned PDFs
+    pipeline_options.do_ocr = False
+    
+    # Initialize the document converter with PDF options
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        }
+    )
+
+@functools.lru_cache(maxsize=8)
+def _get_font(font_size: int) -> ImageFont.ImageFont:
+    """
+    Loads the caption font once per size; the TTF is not re-read for every picture or PDF.
+    """
+    try:
+        # Try to use a default font; fallback if not available
+        return ImageFont.truetype("arial.ttf", font_size)  # Assumes Arial; use default if not
+    except OSError:
+        return ImageFont.load_default()
+
+def _draw_caption(pil_image: Image.Image, caption: str, font: ImageFont.ImageFont, font_size: int) -> Image.Image:
+    """
+    Returns a copy of the image with the caption drawn in a white strip on top.
+    """
+    # Create a new image with caption on top
+    # Assume a white background strip for caption
+    caption_height = font_size + 20  # Padding
+    new_width = pil_image.width
+    new_height = pil_image.height + caption_height
+    new_img = Image.new('RGB', (new_width, new_height), color='white')
+    
+    # Draw caption
+    draw = ImageDraw.Draw(new_img)
+    # Wrap caption if too long: a single measurement gives this caption's average
+    # character width, then textwrap packs the words in one pass. Whitespace is
+    # normalized first since textlength() rejects multiline text.
+    flat = " ".join(caption.split())
+    avg_char_px = draw.textlength(flat, font=font) / max(len(flat), 1)
+    max_chars = max(1, int((new_width - 40) / avg_char_px)) if avg_char_px else max(len(flat), 1)
+    lines = textwrap.wrap(flat, width=max_chars, break_long_words=False)
+    
+    # Draw lines of text
+    y_offset = 10
+    for line in lines:
+        draw.text((20, y_offset), line, fill='black', font=font)
+        y_offset += font_size + 5
+    
+    # Paste the original image below
+    new_img.paste(pil_image, (0, caption_height))
+    
+    return new_img
+
+def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only", font_size: int = 24,
+                                  caption_on_image: bool = False) -> List[Dict[str, Any]]:
     """
     Extracts images (graphs) from a PDF using Docling, along with their captions (headlines).
     Saves each image as a separate PNG file in the output directory and the metadata to a JSON file.
@@ -18,6 +87,7 @@ def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only"
         pdf_path: Path to the input PDF file.
         output_dir: Directory to save the extracted images and JSON metadata (default: "graphs_only").
         font_size: Font size for the caption text (default: 24).
+        caption_on_image: Also draw the caption in a strip above each saved image (default: False).
     
     Returns:
         List of dictionaries containing graph info: index, caption, image_path, page.
@@ -25,24 +95,16 @@ def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only"
     # Create output directory if it doesn't exist
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Configure pipeline options for PDF processing
-    pipeline_options = PdfPipelineOptions()
-    pipeline_options.generate_picture_images = True  # Enable image extraction
-    pipeline_options.images_scale = 2.0  # Higher resolution (scale=1 is 72 DPI)
-    # Optional: Enable OCR if needed for scanned PDFs
-    # pipeline_options.do_ocr = True
-    
-    # Initialize the document converter with PDF options
-    converter = DocumentConverter(
-        format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-        }
-    )
+    # Converter (and its layout models) is built once and reused across calls
+    converter = _get_converter()
     
     # Convert the PDF to a DoclingDocument
     result = converter.convert(pdf_path)
     doc: DoclingDocument = result.document
     
+    # Caption font is loaded once per size for the whole process
+    font = _get_font(font_size) if caption_on_image else None
+    
     # Collect images and captions
     extracted = []
     pic_index = 0
@@ -80,50 +142,15 @@ def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only"
                 print(f"Warning: Could not get image for graph {pic_index}: {e}")
                 continue
             
-            # Create a new image with caption on top
-            # Assume a white background strip for caption
-            caption_height = font_size + 20  # Padding
-            new_width = pil_image.width
-            new_height = pil_image.height + caption_height
-            new_img = Image.new('RGB', (new_width, new_height), color='white')
-            
-            # Draw caption
-            draw = ImageDraw.Draw(new_img)
-            try:
-                # Try to use a default font; fallback if not available
-                font = ImageFont.truetype("arial.ttf", font_size)  # Assumes Arial; use default if not
-            except:
-                font = ImageFont.load_default()
-            
-            # Wrap caption if too long
-            words = caption.split()
-            lines = []
-            current_line = []
-            for word in words:
-                test_line = ' '.join(current_line + [word])
-                if draw.textlength(test_line, font=font) < new_width - 40:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                    current_line = [word]
-            if current_line:
-                lines.append(' '.join(current_line))
-            
-            # Draw lines of text
-            y_offset = 10
-            for line in lines:
-                draw.text((20, y_offset), line, fill='black', font=font)
-                y_offset += font_size + 5
-            
-            # Paste the original image below
-            new_img.paste(pil_image, (0, caption_height))
+            # The caption is stored in the JSON metadata; burning it into the
+            # image is opt-in since it means a second, larger image per graph
+            out_img = _draw_caption(pil_image, caption, font, font_size) if caption_on_image else pil_image
             
             # Save individual image as PNG
             safe_caption = "".join(c for c in caption if c.isalnum() or c in (' ', '-', '_')).rstrip()
             filename = f"{pic_index:03d}_{safe_caption[:50]}.png"
             image_path = os.path.join(output_dir, filename)
-            new_img.save(image_path)
+            out_img.save(image_path, optimize=False, compress_level=1)
             
             print(f"Saved graph {pic_index} as '{filename}' with headline: '{caption[:50]}...'")
             
@@ -137,21 +164,80 @@ def extract_graphs_to_single_file(pdf_path: str, output_dir: str = "graphs_only"
     if extracted:
         # Save metadata to JSON file
         json_path = os.path.join(output_dir, "graphs_only.json")
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(extracted, f, indent=4, ensure_ascii=False)
+        with open(json_path, 'wb') as f:
+            f.write(orjson.dumps(extracted))
         print(f"Saved metadata for {len(extracted)} graphs to '{json_path}'")
     else:
         print("No graphs found in the PDF.")
     
     return extracted
 
-# Direct usage with hardcoded PDF file
+def _init_worker() -> None:
+    """Process-pool initializer: load the Docling converter once per worker."""
+    _get_converter()
+
+def _extract_one(pdf_path: str, output_dir: str, font_size: int) -> Dict[str, Any]:
+    graphs = extract_graphs_to_single_file(pdf_path, output_dir, font_size)
+    return {
+        "source_pdf": pdf_path,
+        "json_path": os.path.join(output_dir, "graphs_only.json") if graphs else None,
+        "image_count": len(graphs)
+    }
+
+def extract_graphs_batch(pdf_paths: List[str], output_root: str = "graphs_only", font_size: int = 24,
+                         max_workers: int = None) -> List[Dict[str, Any]]:
+    """
+    Runs extract_graphs_to_single_file over many PDFs in parallel worker processes.
+    Each PDF gets its own subfolder (output_root/<input index>_<pdf name>) with its images and JSON;
+    the index keeps same-named PDFs from different directories apart.
+    A one-line summary per PDF is appended to output_root/master.jsonl as each one finishes,
+    so graph metadata never has to be held in memory for the whole batch.
+    
+    Args:
+        pdf_paths: Paths to the input PDF files.
+        output_root: Parent directory for the per-PDF output folders (default: "graphs_only").
+        font_size: Font size for the caption text (default: 24).
+        max_workers: Number of worker processes (default: one per CPU, capped at the number of PDFs).
+    
+    Returns:
+        List of per-PDF summaries: source_pdf, json_path, image_count (in completion order).
+    """
+    if not pdf_paths:
+        return []
+    workers = max_workers or min(os.cpu_count() or 1, len(pdf_paths))
+    
+    Path(output_root).mkdir(parents=True, exist_ok=True)
+    master_path = os.path.join(output_root, "master.jsonl")
+    
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex, \
+            open(master_path, 'wb') as master:
+        futures = [
+            ex.submit(_extract_one, p, os.path.join(output_root, f"{i:03d}_{Path(p).stem}"), font_size)
+            for i, p in enumerate(pdf_paths, start=1)
+        ]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="PDFs"):
+            summary = future.result()
+            master.write(orjson.dumps(summary) + b"\n")
+            summaries.append(summary)
+    
+    print(f"Saved batch summary for {len(summaries)} PDFs to '{master_path}'")
+    return summaries
+
+# Usage: python image_extract.py [file1.pdf file2.pdf ...]  (defaults to sample1.pdf)
 if __name__ == "__main__":
-    pdf_file = "sample1.pdf"  # Hardcoded to your sample PDF
-    if not os.path.exists(pdf_file):
-        print(f"Error: PDF file '{pdf_file}' not found. Make sure it's in the current directory.")
-    else:
-        graphs_info = extract_graphs_to_single_file(pdf_file)
+    pdf_files = sys.argv[1:] or ["sample1.pdf"]  # Defaults to your sample PDF
+    for pdf_file in pdf_files:
+        if not os.path.exists(pdf_file):
+            print(f"Error: PDF file '{pdf_file}' not found. Make sure it's in the current directory.")
+    pdf_files = [p for p in pdf_files if os.path.exists(p)]
+    
+    if len(pdf_files) == 1:
+        graphs_info = extract_graphs_to_single_file(pdf_files[0])
         print(f"Extracted {len(graphs_info)} graphs with headlines into 'graphs_only'.")
         for info in graphs_info:
-            print(f"- {info['caption'][:100]}... (from page {info['page']})")
\ No newline at end of file
+            print(f"- {info['caption'][:100]}... (from page {info['page']})")
+    elif pdf_files:
+        summaries = extract_graphs_batch(pdf_files)
+        for summary in summaries:
+            print(f"- {summary['source_pdf']}: {summary['image_count']} graphs → {summary['json_path']}")
\ No newline at end of file
@@ -0,0 +1,57 @@
+# search_local.py  ←  brute-force image search over the local vector backup
+#
+# For small corpora (< ~10K images) a single matrix-vector product over the
+# normalized vectors beats a round-trip to Weaviate's HNSW index.
+# Uses the backup written by data_store_weav.py; no Weaviate connection needed.
+
+import hashlib
+import numpy as np
+from PIL import Image
+from pathlib import Path
+import warnings
+warnings.filterwarnings("ignore")  # removes the long "slow processor" warning
+
+# ----------------------- CONFIG -----------------------
+MODEL_NAME    = "sentence-transformers/clip-ViT-B-32"
+VECTOR_BACKUP = "./my_image_vectors_backup.npy"
+META_BACKUP   = "./my_image_vectors_backup_meta.npz"
+QUERY_IMAGE   = Path("./graphs_only/005_.png")   # ← change if needed
+TOP_K         = 6
+# -----------------------------------------------------
+
+# float16 on disk → float32 once in memory, so the dot product goes through BLAS
+vectors = np.load(VECTOR_BACKUP, mmap_mode="r").astype(np.float32)
+meta = np.load(META_BACKUP)
+filenames, hashes = meta["filenames"], meta["hashes"]
+
+if not QUERY_IMAGE.exists():
+    print(f"Error: Image not found → {QUERY_IMAGE.resolve()}")
+    exit()
+
+# Reuse the stored vector if this exact file was indexed; otherwise run CLIP
+digest = hashlib.blake2b(QUERY_IMAGE.read_bytes(), digest_size=16).hexdigest()
+match = np.flatnonzero(hashes == digest)
+
+if match.size:
+    print(f"Using stored vector for: {QUERY_IMAGE.name}")
+    q = vectors[match[0]]
+else:
+    from clip_encoder import load_clip_model
+
+    print("Loading CLIP model...")
+    model = load_clip_model(MODEL_NAME)
+    print(f"Loading query image: {QUERY_IMAGE.name}")
+    q = model.encode(Image.open(QUERY_IMAGE).convert("RGB"), normalize_embeddings=True).astype(np.float32)
+
+# Vectors are L2-normalized, so the dot product is the cosine similarity
+scores = vectors @ q
+
+k = min(TOP_K, len(scores))
+top = np.argpartition(-scores, k - 1)[:k] if k else np.empty(0, dtype=int)
+top = top[np.argsort(-scores[top])]
+
+print(f"\n{'Rank':<4} {'Filename':<35} {'Distance'}")
+print("-" * 4 + " " + "-"*35 + "  " + "-"*8)
+for i, idx in enumerate(top, 1):
+    # cosine distance, same scale as Weaviate's COSINE metric
+    print(f"{i:<4} {filenames[idx]:<35} {1.0 - scores[idx]:.5f}")
@@ -1,7 +1,11 @@
+import os
 import weaviate
+import torch
 from sentence_transformers import SentenceTransformer
 import json
 
+torch.set_num_threads(os.cpu_count())
+
 # ============================================================
 # 1. Connect to Weaviate Local
 # ============================================================
@@ -17,10 +21,22 @@ client = weaviate.connect_to_local(
 # 2. Embedding Model
 # ============================================================
 
-text_model = SentenceTransformer("all-mpnet-base-v2")
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Loaded once on first query and reused for the life of the process
+_text_model = None
+
+def get_text_model():
+    global _text_model
+    if _text_model is None:
+        _text_model = SentenceTransformer("all-mpnet-base-v2", device=DEVICE)
+        if DEVICE == "cuda":
+            _text_model.half()
+    return _text_model
 
 def embed_text(text: str):
-    return text_model.encode(text).tolist()
+    with torch.inference_mode():
+        return get_text_model().encode(text).tolist()
 
 
 # ============================================================
@@ -4,7 +4,7 @@ import numpy as np
 import os
 import shutil
 import re
-import PyPDF2
+from concurrent.futures import ProcessPoolExecutor
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 
 
@@ -12,59 +12,97 @@ from langchain_text_splitters import MarkdownHeaderTextSplitter
 # 1️⃣ GRAPH + IMAGE EXTRACTION
 # ======================================================================
 
-def extract_graphs(pdf_path, output_folder="graphs_only", dpi=150):
+# Graph-like regions smaller than this (in rendered pixels) are ignored
+MIN_AREA = 40000
+MIN_WIDTH = 250
+MIN_HEIGHT = 180
+
+_worker_doc = None
+_worker_matrix = None
+
+
+def _init_page_worker(pdf_path, dpi):
     """
-    Extract graph-like regions from the PDF.
+    Process-pool initializer: open the PDF and build the render matrix once per worker.
     """
+    global _worker_doc, _worker_matrix
+    _worker_doc = fitz.open(pdf_path)
+    zoom = dpi / 72
+    _worker_matrix = fitz.Matrix(zoom, zoom)
 
-    # Reset folder
-    if os.path.exists(output_folder):
-        shutil.rmtree(output_folder)
-    os.makedirs(output_folder)
 
-    doc = fitz.open(pdf_path)
-    print(f"[INFO] PDF Loaded: {len(doc)} pages")
+def _detect_page_graphs(page_no):
+    """
+    Render one page and return its graph regions (top → bottom) as PNG bytes.
+    """
+    page = _worker_doc[page_no]
 
-    img_count = 0
-    MIN_AREA = 40000
-    MIN_WIDTH = 250
-    MIN_HEIGHT = 180
+    # alpha=False keeps the pixmap 3-channel and contiguous; samples_mv is a
+    # view over it, so no copy is made into numpy
+    pix = page.get_pixmap(matrix=_worker_matrix, alpha=False)
+
+    img = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(
+        pix.height, pix.width, 3
+    )
 
-    for page_no in range(len(doc)):
-        page = doc[page_no]
+    # Preprocess on a UMat so the whole chain can run through OpenCL (T-API);
+    # only the final mask is pulled back for findContours
+    gray = cv2.cvtColor(cv2.UMat(img), cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blur, 50, 150)
 
-        zoom = dpi / 72
-        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    kernel = np.ones((5, 5), np.uint8)
+    dilated = cv2.dilate(edges, kernel, iterations=2).get()
 
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(
-            pix.height, pix.width, 3
-        )
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        # Preprocess
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blur, 50, 150)
+    if not contours:
+        return []
 
-        kernel = np.ones((5, 5), np.uint8)
-        dilated = cv2.dilate(edges, kernel, iterations=2)
+    # One boundingRect per contour, then size filter + top-bottom order in numpy
+    rects = np.array([cv2.boundingRect(c) for c in contours])  # (N, 4): x, y, w, h
+    w, h = rects[:, 2], rects[:, 3]
+    keep = np.flatnonzero((w * h >= MIN_AREA) & (w >= MIN_WIDTH) & (h >= MIN_HEIGHT))
+    keep = keep[np.argsort(rects[keep, 1], kind="stable")]  # top-bottom
 
-        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    graphs = []
+    for x, y, w, h in rects[keep]:
+        _, png = cv2.imencode(".png", img[y:y+h, x:x+w])
+        graphs.append(png.tobytes())
 
-        contours = sorted(contours, key=lambda c: cv2.boundingRect(c)[1])  # top-bottom
+    return graphs
 
-        for cnt in contours:
-            x, y, w, h = cv2.boundingRect(cnt)
-            area = w * h
 
-            if area < MIN_AREA or w < MIN_WIDTH or h < MIN_HEIGHT:
-                continue
+def extract_graphs(pdf_path, output_folder="graphs_only", dpi=150, doc=None):
+    """
+    Extract graph-like regions from the PDF.
+    Pages are rendered and scanned in parallel worker processes.
+    Pass an already-open `doc` to avoid re-parsing the PDF.
+    """
 
-            graph = img[y:y+h, x:x+w]
-            img_count += 1
+    # Reset folder
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+    os.makedirs(output_folder)
 
-            out_path = os.path.join(output_folder, f"graph_{page_no+1}_{img_count}.png")
-            cv2.imwrite(out_path, graph)
-            print(f"[GRAPH SAVED] {out_path}")
+    if doc is None:
+        doc = fitz.open(pdf_path)
+    page_count = len(doc)
+    print(f"[INFO] PDF Loaded: {page_count} pages")
+
+    img_count = 0
+    workers = max(1, min(os.cpu_count() or 1, page_count))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker, initargs=(pdf_path, dpi)) as ex:
+        # map() yields pages in order, so numbering matches a sequential run
+        for page_no, graphs in enumerate(ex.map(_detect_page_graphs, range(page_count))):
+            for png in graphs:
+                img_count += 1
+
+                out_path = os.path.join(output_folder, f"graph_{page_no+1}_{img_count}.png")
+                with open(out_path, "wb") as f:
+                    f.write(png)
+                print(f"[GRAPH SAVED] {out_path}")
 
     print(f"[DONE] Total Graphs Extracted: {img_count}")
     return img_count
@@ -75,59 +113,99 @@ def extract_graphs(pdf_path, output_folder="graphs_only", dpi=150):
 # 2️⃣ TEXT + MARKDOWN HEADINGS + CHUNKS EXTRACTION
 # ======================================================================
 
-def restore_newlines(text):
-    keywords = [
-        "CMP", "Rating", "Target Price", "Stock Info", "Shareholding",
-        "Stock Performance", "Result update", "Key Highlights",
-        "HFCL vs Nifty", "Outlook", "Valuation"
-    ]
+# Patterns are compiled once at import; keyword lists become single alternations
+KEYWORDS = [
+    "CMP", "Rating", "Target Price", "Stock Info", "Shareholding",
+    "Stock Performance", "Result update", "Key Highlights",
+    "HFCL vs Nifty", "Outlook", "Valuation"
+]
+
+FORCED_HEADINGS = [
+    "CMP", "Rating", "Target Price", "Stock Info",
+    "Shareholding Pattern", "Stock Performance",
+    "Key Highlights", "Result update", "HFCL vs Nifty",
+]
+
+_KW_RE = re.compile("|".join(map(re.escape, KEYWORDS)))
+_KW_RANK = {k: i for i, k in enumerate(KEYWORDS)}
+_WORD_CHAR_RE = re.compile(r"\w")
+_DL_RE = re.compile(r"(\d)([A-Za-z])")
+_SPACES_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r"\n{2,}")
+# Line-level heading rules, applied in one pass over the lines (first match wins)
+_COLON_HEADING_RE = re.compile(r"([A-Za-z0-9 /&()\-]+):")
+_FORCED_RE = re.compile(r"(?:" + "|".join(map(re.escape, FORCED_HEADINGS)) + r")\b")
+_TITLE_RE = re.compile(r"[A-Z][A-Za-z0-9 &,:()/\-]{4,}")
 
-    for k in keywords:
-        text = re.sub(rf"(?<!\n){k}\b", f"\n{k}", text)
 
-    text = re.sub(r"(\d)([A-Za-z])", r"\1\n\2", text)
+def restore_newlines(text):
+    # Same result as one re.sub(rf"(?<!\n){k}\b", ...) pass per keyword, in list order.
+    # A keyword glued to the next one only gets its \b from the "\n" that an earlier
+    # pass put in front of that next keyword, so walk the matches right to left.
+    matches = list(_KW_RE.finditer(text))
+    breaks = [False] * len(matches)
+    for j in range(len(matches) - 1, -1, -1):
+        m = matches[j]
+        if m.end() == len(text) or not _WORD_CHAR_RE.match(text, m.end()):
+            breaks[j] = True
+        elif j + 1 < len(matches):
+            nxt = matches[j + 1]
+            breaks[j] = (
+                nxt.start() == m.end()
+                and _KW_RANK[nxt.group()] < _KW_RANK[m.group()]
+                and breaks[j + 1]
+            )
+
+    parts, last = [], 0
+    for m, brk in zip(matches, breaks):
+        if brk and (m.start() == 0 or text[m.start() - 1] != "\n"):
+            parts += [text[last:m.start()], "\n"]
+            last = m.start()
+    parts.append(text[last:])
+    text = "".join(parts)
+
+    text = _DL_RE.sub(r"\1\n\2", text)
 
     return text
 
 
-def convert_to_markdown(text):
-    text = restore_newlines(text)
+def _markdown_heading(line):
+    m = _COLON_HEADING_RE.fullmatch(line)
+    if m:
+        return "## " + m.group(1)
 
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{2,}", "\n", text)
+    if _FORCED_RE.match(line):
+        return "## " + line.strip()
 
-    text = re.sub(r"(?m)^([A-Za-z0-9 /&()\-]+):$", r"## \1", text)
+    # Title-case headings
+    if _TITLE_RE.fullmatch(line):
+        return "# " + line
 
-    forced = [
-        "CMP", "Rating", "Target Price", "Stock Info",
-        "Shareholding Pattern", "Stock Performance",
-        "Key Highlights", "Result update", "HFCL vs Nifty",
-    ]
+    return line
 
-    for h in forced:
-        text = re.sub(rf"(?m)^{h}\b.*$", lambda m: "## " + m.group(0).strip(), text)
 
-    # Title-case headings
-    text = re.sub(
-        r"(?m)^([A-Z][A-Za-z0-9 &,:()/\-]{4,})$",
-        r"# \1",
-    )
+def convert_to_markdown(text):
+    text = restore_newlines(text)
+
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n", text)
+
+    # A line turned into a heading can't match a later rule (it starts with "#"),
+    # so one scan gives the same result as three full-text regex passes
+    text = "\n".join(map(_markdown_heading, text.split("\n")))
 
     return text
 
 
-def extract_text_chunks(pdf_path, output_file="chunks.txt"):
+def extract_text_chunks(pdf_path, output_file="chunks.txt", doc=None):
     """
     Extract text from PDF → fix → convert to markdown → split to ordered chunks
+    Pass an already-open `doc` to avoid re-parsing the PDF.
     """
-    full_text = ""
+    if doc is None:
+        doc = fitz.open(pdf_path)
 
-    with open(pdf_path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            t = page.extract_text()
-            if t:
-                full_text += t + "\n"
+    full_text = "\n".join(page.get_text("text") for page in doc)
 
     markdown_text = convert_to_markdown(full_text)
 
@@ -157,15 +235,20 @@ def extract_text_chunks(pdf_path, output_file="chunks.txt"):
 # ======================================================================
 
 def process_pdf(pdf_path):
+    # Parse the PDF once and share it between both passes
+    doc = fitz.open(pdf_path)
+
     print("\n=========================")
     print(" EXTRACTING GRAPHS...")
     print("=========================")
-    extract_graphs(pdf_path)
+    extract_graphs(pdf_path, doc=doc)
 
     print("\n=========================")
     print(" EXTRACTING TEXT...")
     print("=========================")
-    extract_text_chunks(pdf_path)
+    extract_text_chunks(pdf_path, doc=doc)
+
+    doc.close()
 
     print("\n=========================")
     print(" ALL WORK COMPLETED")
@@ -177,5 +260,17 @@ def process_pdf(pdf_path):
 # RUN
 # ======================================================================
 
+# Glued keywords, as they come out of the PDF text layer
+_RESTORE_NEWLINES_CASES = {
+    "ValuationOutlook": "\nValuation\nOutlook",
+    "RatingCMP": "\nRating\nCMP",
+    "OutlookValuation": "Outlook\nValuation",
+    "ValuationOutlookX": "ValuationOutlookX",
+    "Target Price\nCMP 120": "\nTarget Price\nCMP 120",
+}
+
 if __name__ == "__main__":
+    for raw, expected in _RESTORE_NEWLINES_CASES.items():
+        assert restore_newlines(raw) == expected, (raw, restore_newlines(raw))
+
     process_pdf("sample1.pdf")
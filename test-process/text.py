@@ -58,6 +58,7 @@
 import weaviate
 from sentence_transformers import SentenceTransformer
 from weaviate.classes.config import Configure
+from weaviate.classes.data import DataObject
 
 
 # ------------------------ LOAD CHUNKS ------------------------
@@ -80,7 +81,7 @@ def load_chunks(file_path):
 # ------------------------ EMBEDDING MODEL ------------------------
 def embed_chunks(chunks):
     model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-    embeddings = model.encode(chunks)
+    embeddings = model.encode(chunks, batch_size=64, convert_to_numpy=True, show_progress_bar=True)
     return embeddings
 
 
@@ -116,13 +117,17 @@ def store_in_weaviate(chunks, embeddings):
 
         collection = client.collections.get(class_name)
 
-        # Insert embeddings
-        for idx, (text, vector) in enumerate(zip(chunks, embeddings), start=1):
-            collection.data.insert(
-                properties={"text": text},
-                vector=vector.tolist()
-            )
-            print(f"Inserted chunk {idx}/{len(chunks)}")
+        # Insert all embeddings in one batched request
+        objects = [
+            DataObject(properties={"text": text}, vector=vector)
+            for text, vector in zip(chunks, embeddings)
+        ]
+        result = collection.data.insert_many(objects)
+
+        if result.has_errors:
+            for idx, err in result.errors.items():
+                print(f"Failed chunk {idx + 1}/{len(chunks)}: {err.message}")
+        print(f"Inserted {len(chunks) - len(result.errors)}/{len(chunks)} chunks")
 
         print("\n⭐ All embeddings stored in Weaviate!")
 
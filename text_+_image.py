@@ -1,16 +1,23 @@
 import os
+import re
 import json
+import orjson
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from typing import List, Dict, Any
 
+import numpy as np
+
+import torch
 import weaviate
 from weaviate.classes.config import Configure
 
 from sentence_transformers import SentenceTransformer
-from PIL import Image
-from pdf2image import convert_from_path
 
-from docling.document_converter import DocumentConverter
+from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.base_models import InputFormat
+from docling.datamodel.pipeline_options import PdfPipelineOptions
 from docling_core.types.doc import DoclingDocument
 
 
@@ -21,7 +28,15 @@ logging.basicConfig(level=logging.INFO)
 # ============================================================
 
 VECTOR_SIZE = 512
-model = SentenceTransformer("clip-ViT-B-32")
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# encode() sorts inputs by length before batching, so batches carry little padding;
+# CLIP text is capped at 77 tokens, so large batches fit easily on a GPU
+TEXT_BATCH_SIZE = 1024 if DEVICE == "cuda" else 64
+IMAGE_BATCH_SIZE = 16
+
+model = SentenceTransformer("clip-ViT-B-32", device=DEVICE)
+if DEVICE == "cuda":
+    model.half()  # FP16 on GPU
 
 
 # ============================================================
@@ -45,8 +60,14 @@ os.makedirs(BACKUP_DIR, exist_ok=True)
 
 def write_backup(data, step_name):
     path = os.path.join(BACKUP_DIR, f"{step_name}.json")
-    with open(path, "w") as f:
-        json.dump(data, f, indent=4)
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    logging.info(f"[BACKUP SAVED] {path}")
+
+def write_vectors(vectors, name):
+    # Raw float32 .npy next to the JSON; JSON entries point at rows via "vec_idx"
+    path = os.path.join(BACKUP_DIR, f"{name}.npy")
+    np.save(path, np.asarray(vectors, dtype=np.float32))
     logging.info(f"[BACKUP SAVED] {path}")
 
 
@@ -103,10 +124,32 @@ def ensure_collection():
 # 5. DOCLING EXTRACTION
 # ============================================================
 
-converter = DocumentConverter()
+# Built on first use and reused for every PDF; importing this module
+# (e.g. only for semantic_search) doesn't load the Docling models.
+_CONVERTER = None
+
+def get_converter():
+    global _CONVERTER
+
+    if _CONVERTER is None:
+        # No picture crops and no OCR (enable do_ocr for scanned PDFs). Full page images
+        # are kept so the image step reuses Docling's render instead of rasterizing again.
+        pipeline_options = PdfPipelineOptions()
+        pipeline_options.generate_picture_images = False
+        pipeline_options.generate_page_images = True
+        pipeline_options.images_scale = 2.0  # scale=1 is 72 DPI
+        pipeline_options.do_ocr = False
+
+        _CONVERTER = DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+            }
+        )
+
+    return _CONVERTER
 
 def extract_docling_content(pdf_path):
-    result = converter.convert(pdf_path)
+    result = get_converter().convert(pdf_path)
     doc: DoclingDocument = result.document
 
     out = {
@@ -140,6 +183,14 @@ def extract_docling_content(pdf_path):
             out["figures"].append(text)
 
     write_backup(out, "step_1_docling")
+
+    # Rendered pages as (page_no, PIL image), in page order — not part of the JSON backup.
+    # Pages without a render are skipped, so keep the real page number with each image.
+    out["page_images"] = [
+        (no, doc.pages[no].image.pil_image)
+        for no in sorted(doc.pages)
+        if doc.pages[no].image is not None
+    ]
     return out
 
 
@@ -147,17 +198,25 @@ def extract_docling_content(pdf_path):
 # 6. IMAGE EXTRACTION
 # ============================================================
 
-def extract_images(pdf_path):
-    pages = convert_from_path(pdf_path)
+# Pages are embedded straight from the in-memory PIL images; the PNGs are only
+# archival copies of what the "content" paths in Weaviate point to.
+
+def page_image_path(page_no):
+    return f"images/page_{page_no}.png"
+
+def save_page_image(page_no, img):
+    path = page_image_path(page_no)
+    img.save(path, "PNG", compress_level=1, optimize=False)  # favour encode speed over file size
+    return path
+
+def save_page_images(page_images):
+    # page_images: (page_no, PIL image) pairs
     os.makedirs("images", exist_ok=True)
 
-    paths = []
-    for i, p in enumerate(pages):
-        path = f"images/page_{i+1}.png"
-        p.save(path, "PNG")
-        paths.append(path)
+    # PNG encodes run in parallel; Pillow releases the GIL while encoding
+    with ThreadPoolExecutor(max_workers=max(1, min(os.cpu_count() or 1, len(page_images)))) as ex:
+        paths = list(ex.map(lambda pair: save_page_image(*pair), page_images))
 
-    write_backup({"images": paths}, "step_2_images")
     return paths
 
 
@@ -165,38 +224,52 @@ def extract_images(pdf_path):
 # 7. CHUNK TEXT
 # ============================================================
 
+WORD_RE = re.compile(r"\S+")
+
 def chunk_text(text, max_len=300):
-    words = text.split()
-    chunks, cur = [], []
+    # Yields slices of the original text of up to max_len words each;
+    # only word offsets are tracked, no per-word strings or re-joins
+    start = end = 0
+    count = 0
 
-    for w in words:
-        cur.append(w)
-        if len(cur) >= max_len:
-            chunks.append(" ".join(cur))
-            cur = []
+    for m in WORD_RE.finditer(text):
+        if count == 0:
+            start = m.start()
+        end = m.end()
+        count += 1
 
-    if cur:
-        chunks.append(" ".join(cur))
+        if count >= max_len:
+            yield text[start:end]
+            count = 0
 
-    return chunks
+    if count:
+        yield text[start:end]
 
 
 # ============================================================
 # 8. EMBEDDINGS
 # ============================================================
 
-def embed_text(text):
-    return model.encode(text).tolist()
+# Pass whole lists: batched forward passes over length-sorted inputs
+# instead of one per item. Returns numpy; Weaviate v4 accepts it as a vector.
+
+def embed_text(texts):
+    return model.encode(texts, batch_size=TEXT_BATCH_SIZE, device=DEVICE, convert_to_numpy=True, show_progress_bar=False)
 
-def embed_image(path):
-    img = Image.open(path)
-    return model.encode(img).tolist()
+def embed_images(images):
+    # PIL images in, no disk round-trip; the CLIP processor handles RGB conversion
+    return model.encode(images, batch_size=IMAGE_BATCH_SIZE, device=DEVICE, convert_to_numpy=True, show_progress_bar=False)
 
 
 # ============================================================
 # 9. PIPELINE
 # ============================================================
 
+def report_failed_inserts(collection, step):
+    failed = collection.batch.failed_objects
+    if failed:
+        logging.warning(f"[{step}] {len(failed)} objects failed to insert, e.g.: {failed[0].message}")
+
 def process_pdf(pdf_path):
     logging.info("===== START PIPELINE =====")
 
@@ -210,23 +283,30 @@ def process_pdf(pdf_path):
     # Step 1
     extracted = extract_docling_content(pdf_path)
 
-    # Step 2
-    images = extract_images(pdf_path)
+    # Step 2 — pages were already rendered by Docling in step 1; kept in memory
+    page_images = extracted["page_images"]
+    images = [page_image_path(no) for no, _ in page_images]
 
     # Step 3 — Text chunks
-    blocks = []
-    blocks += [(t, "header") for t in extracted["headers"]]
-    blocks += [(t, "paragraph") for t in extracted["paragraphs"]]
-    blocks += [(t, "list") for t in extracted["lists"]]
-    blocks += [(t, "table") for t in extracted["tables"]]
+    blocks = chain(
+        ((t, "header") for t in extracted["headers"]),
+        ((t, "paragraph") for t in extracted["paragraphs"]),
+        ((t, "list") for t in extracted["lists"]),
+        ((t, "table") for t in extracted["tables"]),
+    )
 
-    chunk_backup = []
+    all_chunks, chunk_types = [], []
 
     for text, ttype in blocks:
         for ch in chunk_text(text):
-            vec = embed_text(ch)
+            all_chunks.append(ch)
+            chunk_types.append(ttype)
+
+    vecs = embed_text(all_chunks)
 
-            collection.data.insert(
+    with collection.batch.dynamic() as batch:
+        for i, (ch, ttype, vec) in enumerate(zip(all_chunks, chunk_types, vecs)):
+            batch.add_object(
                 properties={
                     "content": ch,
                     "content_type": ttype,
@@ -235,35 +315,37 @@ def process_pdf(pdf_path):
                 vector=vec
             )
 
-            item = {"content": ch, "type": ttype, "vector": vec}
-            chunk_backup.append(item)
+            item = {"content": ch, "type": ttype, "vec_idx": i}
             all_backup["chunks"].append(item)
 
-    write_backup(chunk_backup, "step_3_chunks")
+    report_failed_inserts(collection, "chunks")
 
     # Step 4 — Images
-    img_backup = []
-
-    for path in images:
-        vec = embed_image(path)
-
-        collection.data.insert(
-            properties={
-                "content": path,
-                "content_type": "image",
-                "metadata": json.dumps({"path": path})
-            },
-            vector=vec
-        )
+    img_vecs = embed_images([img for _, img in page_images])
 
-        entry = {"path": path, "vector": vec}
-        img_backup.append(entry)
-        all_backup["images"].append(entry)
+    with collection.batch.dynamic() as batch:
+        for i, (path, vec) in enumerate(zip(images, img_vecs)):
+            batch.add_object(
+                properties={
+                    "content": path,
+                    "content_type": "image",
+                    "metadata": json.dumps({"path": path})
+                },
+                vector=vec
+            )
 
-    write_backup(img_backup, "step_4_image_vectors")
+            entry = {"path": path, "vec_idx": i}
+            all_backup["images"].append(entry)
 
-    # Final
+    report_failed_inserts(collection, "images")
+
+    # Final — the only vector backup; it already holds every chunk and image
     write_backup(all_backup, "step_final")
+    write_vectors(vecs, "step_final_chunk_vectors")
+    write_vectors(img_vecs, "step_final_image_vectors")
+
+    # Archival PNGs for the image paths stored in Weaviate, written once in parallel
+    save_page_images(page_images)
 
     logging.info("===== PIPELINE COMPLETE =====")
     client.close()
@@ -285,6 +367,21 @@ def semantic_search(query, top_k=3):
 
     return res.objects
 
+def semantic_search_batch(queries, top_k=3, max_workers=8):
+    # One batched encode for all queries, then the near_vector lookups run concurrently
+    col = client.collections.get("PDFContent")
+    vecs = embed_text(list(queries))
+
+    def search(vec):
+        return col.query.near_vector(
+            near_vector=vec,
+            limit=top_k,
+            return_properties=["content", "content_type", "metadata"]
+        ).objects
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        return list(ex.map(search, vecs))
+
 
 # ============================================================
 # 11. MAIN